@@ -1,12 +1,74 @@
+import copy
+import mistune
+import mmap
 import nbformat
+import orjson
 import os
 import re
-from copy import deepcopy
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from hashlib import blake2b
+from nbformat.v4.rwbase import strip_transient
+
+# Regular expressions are compiled once at import time since the detectors and
+# markdown converters below run for every cell of every converted notebook
+_SUBPLOT_RE = re.compile(r'plt\.subplots\s*\(\s*(\d+)\s*,\s*(\d+)')
+_SUBPLOT_FALLBACK_RE = re.compile(r'subplots\s*\(\s*(\d+)\s*,\s*(\d+)')
+_FIGSIZE_RE = re.compile(r'figsize\s*=\s*\[[^\]]+\]')
+_DPI_RE = re.compile(r'dpi\s*=\s*\d+')
+
+_SECONDARY_HEADING_RE = re.compile(r'^(##\s+.+$)', re.MULTILINE)
+_REFERENCES_RE = re.compile(r'^(#+\s+References:?.*$)', re.MULTILINE | re.IGNORECASE)
+
+# LaTeX math extraction
+# A single pattern extracts every kind of math expression in one pass; the
+# name of the matching group gives the block type
+_MATH_RE = re.compile(
+    r'(?P<align>\\begin\{align\}.*?\\end\{align\})'
+    r'|(?P<env>\\begin\{(?P<env_name>[^}]+)\}.*?\\end\{(?P=env_name)\})'
+    r'|\$\$(?P<display>.*?)\$\$'
+    r'|(?<!\$)\$(?P<inline>[^$\n]+?)\$(?!\$)',
+    re.DOTALL
+)
+_PARENS_RE = re.compile(r'\(([^)]*)\)')
+# Rendered code spans and blocks, whose text must reach the page verbatim, and every
+# other tag, whose attributes (e.g. link URLs) must not be rewritten. They are set
+# aside behind private-use codepoints, which cannot clash with notebook text
+_HTML_STASH_RE = re.compile(r'<pre\b.*?</pre>|<code\b.*?</code>|<[^>]*>', re.DOTALL)
+_HTML_STASH_PLACEHOLDER_RE = re.compile('\uE002(\\d+)\uE003')
+_CITATION_RE = re.compile(r'\[(\d+)\]')
+# Math placeholders are wrapped in private-use codepoints, which cannot occur in
+# notebook text, so literal text is never mistaken for a placeholder
+_PLACEHOLDER_RE = re.compile('\uE000(\\d+)\uE001')
+
+# References section formatting
+# Numerical citations like [1] and bracketed descriptive text like [Computer software]
+_REFERENCE_BRACKET_RE = re.compile(r'\[(?:(\d+)|([^\]0-9][^\]]*))\]')
+_URL_RE = re.compile(r'(https?://\S+)')
+
+# Markdown renderer for regular content; raw HTML such as citation spans is passed
+# through untouched, and math placeholders are plain text to it
+_MD = mistune.create_markdown(plugins=['strikethrough', 'table'], escape=False)
+
+# Code cell detectors
+_STATUS_DISPLAY_RE = re.compile(r'display\s*\(\s*HTML\s*\(\s*[frf]?""".*background:\s*#', re.DOTALL)
+_SETUP_RE = re.compile(r'^\s*(?:import\s+|from\s+.*\s+import|!pip\s+|!conda\s+)', re.MULTILINE)
+# Any of these markers identifies a cell with interactive widgets or plots
+_INTERACTIVE_RE = re.compile(
+    r'interact\s*\(|ipywidgets\.'
+    r'|FloatSlider|IntSlider|Dropdown|Button|Checkbox|SelectionSlider|Play|DatePicker'
+    r'|ThermalWidget|@interact|interactive'
+    r'|widgets\.|HBox|VBox|Tab|Accordion'
+    r'|\.observe\s*\(|display\s*\(\s*\w*Box\s*\('
+)
 
 def has_no_output_comment(source):
     """Check if a code cell has the 'NO OUTPUT' comment."""
-    lines = source.strip().split('\n')
-    for line in lines:
+    # Most cells have no such comment, which a single check over the whole source rules out
+    if 'NO OUTPUT' not in source.upper():
+        return False
+    for line in source.split('\n'):
         stripped = line.strip()
         if stripped.startswith('#') and 'NO OUTPUT' in stripped.upper():
             return True
@@ -21,10 +83,10 @@ def detect_and_adjust_matplotlib_code(code):
         return code
     
     # Extract subplot configuration
-    subplot_match = re.search(r'plt\.subplots\s*\(\s*(\d+)\s*,\s*(\d+)', code)
+    subplot_match = _SUBPLOT_RE.search(code)
     if not subplot_match:
         # Try alternative pattern
-        subplot_match = re.search(r'subplots\s*\(\s*(\d+)\s*,\s*(\d+)', code)
+        subplot_match = _SUBPLOT_FALLBACK_RE.search(code)
     
     if subplot_match:
         rows = int(subplot_match.group(1))
@@ -54,52 +116,29 @@ def detect_and_adjust_matplotlib_code(code):
             figsize = '[14, 8.5]'
             dpi = '80'
         
-        # Replace figsize parameter
-        code = re.sub(r'figsize\s*=\s*\[[^\]]+\]', f'figsize={figsize}', code)
-        
-        # Replace or add DPI parameter
+        # Replace figsize parameter and replace or add DPI parameter; substring
+        # checks skip the regex scans when there is nothing to replace
         if 'dpi=' in code:
-            code = re.sub(r'dpi\s*=\s*\d+', f'dpi={dpi}', code)
-        else:
-            # Add DPI parameter after figsize
-            code = re.sub(r'(figsize\s*=\s*\[[^\]]+\])', rf'\1, dpi={dpi}', code)
+            if 'figsize' in code:
+                code = _FIGSIZE_RE.sub(f'figsize={figsize}', code)
+            code = _DPI_RE.sub(f'dpi={dpi}', code)
+        elif 'figsize' in code:
+            # Add DPI parameter after figsize in the same pass
+            code = _FIGSIZE_RE.sub(f'figsize={figsize}, dpi={dpi}', code)
     
     # Also adjust any standalone figure size definitions
     else:
         # Look for figsize definitions without subplots
         if 'figsize' in code:
             # Apply conservative sizing for single plots (reduced from [10, 6])
-            code = re.sub(r'figsize\s*=\s*\[[^\]]+\]', 'figsize=[8.5, 5]', code)
+            code = _FIGSIZE_RE.sub('figsize=[8.5, 5]', code)
             if 'dpi=' in code:
-                code = re.sub(r'dpi\s*=\s*\d+', 'dpi=120', code)
+                code = _DPI_RE.sub('dpi=120', code)
     
     return code
 
-def convert_notebook_to_voila(input_notebook, output_notebook, css_path=None):
-    """
-    Transform a standard Jupyter notebook into a polished Voila presentation.
-    
-    This function converts a regular notebook into one with beautiful HTML styling,
-    proper MathJax support, and optimized widget layouts for web presentation.
-    
-    Args:
-        input_notebook (str): Path to the source Jupyter notebook
-        output_notebook (str): Destination path for the styled notebook
-        css_path (str, optional): Custom CSS file to override default styling
-    """
-    # Read the original notebook structure
-    with open(input_notebook, 'r', encoding='utf-8') as f:
-        nb = nbformat.read(f, as_version=4)
-    
-    # Initialize a fresh notebook with preserved metadata
-    new_nb = nbformat.v4.new_notebook()
-    new_nb.metadata = nb.metadata.copy()
-    # Mark notebook as trusted to prevent security warnings in Voila
-    new_nb.metadata['trusted'] = True
-    
-    # Create the foundation cell with MathJax configuration and styling
-    # This hidden cell sets up the mathematical typesetting and visual appearance
-    styling_cell = nbformat.v4.new_code_cell(source="""
+# Foundation cell with MathJax configuration; the CSS goes between the two parts
+_STYLING_PREAMBLE = """
 # This cell configures the notebook's appearance and mathematical rendering
 from IPython.display import display, HTML
 
@@ -130,114 +169,47 @@ MathJax.Hub.Config({
 <script src="https://cdn.jsdelivr.net/npm/mathjax@2/MathJax.js?config=TeX-AMS_HTML"></script>
 
 <style>
-""" + (load_css(css_path) if css_path else DEFAULT_CSS) + """
+"""
+
+_STYLING_POSTAMBLE = """
 </style>
 \"\"\"))
-""")
-    styling_cell.metadata.tags = ["hide-input"]
-    new_nb.cells.append(styling_cell)
-    
-    # Extract the main title from the first markdown heading
-    # This will become our prominent page header
-    title = "Jupyter Notebook"
-    title_cell_index = None
-    
-    for i, cell in enumerate(nb.cells):
-        if cell.cell_type == "markdown" and cell.source.startswith("# "):
-            lines = cell.source.splitlines()
-            title = lines[0].strip("# ")
-            title_cell_index = i
-            break
-    
-    # Create a styled title section at the top of the presentation
-    title_cell = nbformat.v4.new_code_cell(source=f"""
+"""
+
+@lru_cache(maxsize=8)
+def _build_styling_source(css_text):
+    """Source of the styling cell, built once per stylesheet."""
+    return _STYLING_PREAMBLE + css_text + _STYLING_POSTAMBLE
+
+# Templates for the converted notebook; markdown wrappers are filled in with
+# str.format, code cells are assembled by joining the original code between a
+# fixed preamble and postamble
+_TMPL_TITLE = """
 # Display the main title with professional styling
 display(HTML(\"\"\"
 <h1>{title}</h1>
 \"\"\"))
-""")
-    title_cell.metadata.tags = ["hide-input"]
-    new_nb.cells.append(title_cell)
-    
-    # Process each cell from the original notebook
-    for i, cell in enumerate(nb.cells):
-        if cell.cell_type == "markdown":
-            # Handle the title cell specially to avoid duplication
-            if i == title_cell_index:
-                lines = cell.source.splitlines()
-                if len(lines) > 1:  # Check if there's content beyond the title
-                    # Extract everything after the main title
-                    remaining_content = '\n'.join(lines[1:])
-                    
-                    # Look for secondary headings to organize content properly
-                    secondary_headings = re.findall(r'^##\s+.+$', remaining_content, re.MULTILINE)
-                    
-                    if secondary_headings:
-                        # Split content at the first secondary heading
-                        parts = re.split(r'^(##\s+.+$)', remaining_content, 1, re.MULTILINE)
-                        
-                        # The introduction is everything before the first subheading
-                        intro_content = parts[0].strip()
-                        
-                        # Add introduction content with special styling
-                        if intro_content:
-                            new_cell = nbformat.v4.new_code_cell(source=f"""
-# Display introduction content with distinctive styling
-display(HTML(\"\"\"
-<div class="intro-content">
-{convert_markdown_to_html(intro_content)}
-</div>
-\"\"\"))
-""")
-                            new_cell.metadata.tags = ["hide-input"]
-                            new_nb.cells.append(new_cell)
-                        
-                        # Add the remaining content as a regular section
-                        rest_content = parts[1] + (parts[2] if len(parts) > 2 else "")
-                        if rest_content.strip():
-                            new_cell = nbformat.v4.new_code_cell(source=f"""
-# Display remaining content from title cell
-display(HTML(\"\"\"
-<div class="section">
-{convert_markdown_to_html(rest_content)}
-</div>
-\"\"\"))
-""")
-                            new_cell.metadata.tags = ["hide-input"]
-                            new_nb.cells.append(new_cell)
-                    else:
-                        # No subheadings found - treat all as introduction
-                        if remaining_content.strip():
-                            new_cell = nbformat.v4.new_code_cell(source=f"""
-# Display introduction content
+"""
+
+_TMPL_INTRO = """
+# {comment}
 display(HTML(\"\"\"
 <div class="intro-content">
-{convert_markdown_to_html(remaining_content)}
+{html}
 </div>
 \"\"\"))
-""")
-                            new_cell.metadata.tags = ["hide-input"]
-                            new_nb.cells.append(new_cell)
-            else:
-                # Convert regular markdown cells to styled HTML sections
-                new_cell = nbformat.v4.new_code_cell(source=f"""
-# Convert markdown content to styled HTML
+"""
+
+_TMPL_SECTION = """
+# {comment}
 display(HTML(\"\"\"
 <div class="section">
-{convert_markdown_to_html(cell.source)}
+{html}
 </div>
 \"\"\"))
-""")
-                new_cell.metadata.tags = ["hide-input"]
-                new_nb.cells.append(new_cell)
-            
-        elif cell.cell_type == "code":
-            # Process different types of code cells appropriately
-            
-            # Check for NO OUTPUT comment first
-            if has_no_output_comment(cell.source):
-                # Execute code but completely suppress all output
-                new_cell = nbformat.v4.new_code_cell(source=f"""
+"""
+
+_NO_OUTPUT_PREAMBLE = """
 # Execute code without displaying output (NO OUTPUT comment detected)
 import sys
 import io
@@ -249,84 +221,36 @@ null_stderr = io.StringIO()
 
 # Execute code with all output redirected to null
 with redirect_stdout(null_stdout), redirect_stderr(null_stderr):
-{indent_code(cell.source)}
+"""
+
+_NO_OUTPUT_POSTAMBLE = """
     
 # Clear the null streams to free memory
 null_stdout.close()
 null_stderr.close()
-""")
-                new_cell.metadata.tags = ["hide-input"]
-                new_nb.cells.append(new_cell)
-                
-            elif contains_status_display(cell.source):
-                # Preserve cells that display colored status messages
-                new_cell = nbformat.v4.new_code_cell(source=f"""
-# Execute cell with status display output
-{cell.source}
-""")
-                new_cell.metadata.tags = ["hide-input"]
-                new_nb.cells.append(new_cell)
-                
-            elif is_import_or_setup_cell(cell.source):
-                # Hide import statements and setup code from the presentation
-                new_cell = nbformat.v4.new_code_cell(source=f"""
-# Execute setup/import code (hidden from presentation)
-{cell.source}
-""")
-                new_cell.metadata.tags = ["hide-input"]
-                new_nb.cells.append(new_cell)
-                
-            elif contains_interactive_plot(cell.source):
-                # Special handling for interactive widgets and plots
-                # Add descriptive headers based on the widget type
-                if 'ThermalWidget' in cell.source:
-                    header_html = """
-<div class="widget-area">
-    <h3>Interactive Thermal Homogenization Explorer</h3>
-    <p>Use the controls below to explore thermal properties of heterogeneous materials in real-time:</p>
-    <ul>
-        <li><strong>Microstructure ID:</strong> Select from 30,000 different microstructure samples</li>
-        <li><strong>Inclusion Conductivity:</strong> Change the thermal conductivity of the inclusion material</li>
-        <li><strong>Loading Angle:</strong> Adjust the direction of the applied temperature gradient</li>
-    </ul>
-    <p><em>Note</em>: If the widget is not displayed, try executing the cell again</p>
-</div>
 """
-                elif any(widget in cell.source for widget in ['FloatSlider', 'IntSlider', 'interact']):
-                    header_html = """
-<div class="widget-area">
-    <h3>Interactive Plot</h3>
-    <p>Use the controls below to adjust the visualization:</p>
-</div>
+
+_STATUS_PREAMBLE = """
+# Execute cell with status display output
 """
-                else:
-                    # Generic interactive content header
-                    header_html = """
-<div class="widget-area">
-    <h3>Interactive Content</h3>
-    <p>Interactive elements are displayed below:</p>
-</div>
+
+_SETUP_PREAMBLE = """
+# Execute setup/import code (hidden from presentation)
 """
-                
-                # Preserve the interactive functionality with added context
-                new_cell = nbformat.v4.new_code_cell(source=f"""
+
+_WIDGET_PREAMBLE = """
 # Display interactive widget with descriptive header
 from IPython.display import display, HTML
 
 # Add informative header for the interactive content
-display(HTML(\"\"\"{header_html}\"\"\"))
+display(HTML(\"\"\""""
+
+_WIDGET_CODE_PREAMBLE = """\"\"\"))
 
 # Execute the original interactive code
-{cell.source}
-""")
-                new_cell.metadata.tags = ["hide-input"]
-                new_nb.cells.append(new_cell)
-            else:
-                # Handle regular code cells by capturing and styling their output
-                # Check if this is a matplotlib plotting cell and adjust if needed
-                adjusted_code = detect_and_adjust_matplotlib_code(cell.source)
-                
-                new_cell = nbformat.v4.new_code_cell(source=f"""
+"""
+
+_REGULAR_OUTPUT_PREAMBLE = """
 # Execute code and display output in styled container
 from IPython.display import display, HTML
 
@@ -340,25 +264,225 @@ try:
     sys.stdout = _stdout_capture
     
     # Run the original code (with matplotlib adjustments if applicable)
-{indent_code(adjusted_code)}
+"""
+
+_REGULAR_OUTPUT_POSTAMBLE = """
     
     # Restore stdout and capture what was printed
     sys.stdout = _original_stdout
     _original_output = _stdout_capture.getvalue()
 except Exception as e:
     import traceback
-    _original_output = f"Error: {{str(e)}}\\n{{traceback.format_exc()}}"
+    _original_output = f"Error: {str(e)}\\n{traceback.format_exc()}"
 finally:
     # Display any output in a nicely styled container
     if _original_output and _original_output.strip():
         display(HTML(f\"\"\"
         <div style="background: #e6f7ff; padding: 10px; border-radius: 5px; margin: 10px 0;">
-            <pre style="margin: 0; background: transparent; white-space: pre-wrap; font-family: 'Consolas', 'Monaco', monospace;">{{_original_output}}</pre>
+            <pre style="margin: 0; background: transparent; white-space: pre-wrap; font-family: 'Consolas', 'Monaco', monospace;">{_original_output}</pre>
         </div>
         \"\"\"))
-""")
+"""
+
+# Descriptive headers shown above interactive widgets
+_WIDGET_HEADER_THERMAL = """
+<div class="widget-area">
+    <h3>Interactive Thermal Homogenization Explorer</h3>
+    <p>Use the controls below to explore thermal properties of heterogeneous materials in real-time:</p>
+    <ul>
+        <li><strong>Microstructure ID:</strong> Select from 30,000 different microstructure samples</li>
+        <li><strong>Inclusion Conductivity:</strong> Change the thermal conductivity of the inclusion material</li>
+        <li><strong>Loading Angle:</strong> Adjust the direction of the applied temperature gradient</li>
+    </ul>
+    <p><em>Note</em>: If the widget is not displayed, try executing the cell again</p>
+</div>
+"""
+
+_WIDGET_HEADER_SLIDER = """
+<div class="widget-area">
+    <h3>Interactive Plot</h3>
+    <p>Use the controls below to adjust the visualization:</p>
+</div>
+"""
+
+_WIDGET_HEADER_GENERIC = """
+<div class="widget-area">
+    <h3>Interactive Content</h3>
+    <p>Interactive elements are displayed below:</p>
+</div>
+"""
+
+def _no_output_source(code):
+    """Execute code but completely suppress all output."""
+    return ''.join((_NO_OUTPUT_PREAMBLE, indent_code(code), _NO_OUTPUT_POSTAMBLE))
+
+def _status_source(code):
+    """Preserve cells that display colored status messages."""
+    return ''.join((_STATUS_PREAMBLE, code, '\n'))
+
+def _setup_source(code):
+    """Hide import statements and setup code from the presentation."""
+    return ''.join((_SETUP_PREAMBLE, code, '\n'))
+
+def _interactive_source(code):
+    """Special handling for interactive widgets and plots."""
+    # Add descriptive headers based on the widget type
+    if 'ThermalWidget' in code:
+        header_html = _WIDGET_HEADER_THERMAL
+    elif any(widget in code for widget in ['FloatSlider', 'IntSlider', 'interact']):
+        header_html = _WIDGET_HEADER_SLIDER
+    else:
+        # Generic interactive content header
+        header_html = _WIDGET_HEADER_GENERIC
+    
+    # Preserve the interactive functionality with added context
+    return ''.join((_WIDGET_PREAMBLE, header_html, _WIDGET_CODE_PREAMBLE, code, '\n'))
+
+def _regular_source(code):
+    """Handle regular code cells by capturing and styling their output."""
+    # Check if this is a matplotlib plotting cell and adjust if needed
+    adjusted_code = detect_and_adjust_matplotlib_code(code)
+    return ''.join((_REGULAR_OUTPUT_PREAMBLE, indent_code(adjusted_code), _REGULAR_OUTPUT_POSTAMBLE))
+
+# Builds the source of the presentation cell for each kind of code cell
+_CODE_CELL_BUILDERS = {
+    'no_output': _no_output_source,
+    'status': _status_source,
+    'setup': _setup_source,
+    'interactive': _interactive_source,
+    'regular': _regular_source,
+}
+
+def convert_notebook_to_voila(input_notebook, output_notebook, css_path=None, use_cache=True):
+    """
+    Transform a standard Jupyter notebook into a polished Voila presentation.
+    
+    This function converts a regular notebook into one with beautiful HTML styling,
+    proper MathJax support, and optimized widget layouts for web presentation.
+    Results are cached in CACHE_DIR, so converting an unchanged notebook again
+    only copies the earlier output.
+    
+    Args:
+        input_notebook (str): Path to the source Jupyter notebook
+        output_notebook (str): Destination path for the styled notebook
+        css_path (str, optional): Custom CSS file to override default styling
+        use_cache (bool, optional): Reuse and store conversions in CACHE_DIR
+    """
+    # Reuse an earlier conversion of the same notebook, styling and converter
+    cache_file = _cache_file(input_notebook, css_path) if use_cache else None
+    if cache_file and os.path.exists(cache_file):
+        shutil.copyfile(cache_file, output_notebook)
+    else:
+        # Read the original notebook structure and build the presentation
+        nb = read_notebook(input_notebook)
+        new_nb = build_voila_notebook(nb, css_path)
+        
+        # Save the transformed notebook
+        write_notebook(new_nb, output_notebook)
+        if cache_file:
+            _store_in_cache(output_notebook, cache_file)
+    
+    print(f"Conversion complete: {input_notebook} → {output_notebook}")
+    print(f"Run with: voila {output_notebook} --template=material --theme=light")
+
+def build_voila_notebook(nb, css_path=None):
+    """
+    Build the styled Voila presentation for a parsed notebook.
+    
+    Args:
+        nb (NotebookNode): Source notebook in nbformat version 4
+        css_path (str, optional): Custom CSS file to override default styling
+    
+    Returns:
+        NotebookNode: The presentation notebook
+    """
+    # Initialize a fresh notebook with preserved metadata
+    new_nb = nbformat.v4.new_notebook()
+    new_nb.metadata = dict(nb.metadata)
+    # Mark notebook as trusted to prevent security warnings in Voila
+    new_nb.metadata['trusted'] = True
+    
+    # Create the foundation cell with MathJax configuration and styling
+    # This hidden cell sets up the mathematical typesetting and visual appearance
+    styling_cell = nbformat.v4.new_code_cell(source=_build_styling_source(load_css(css_path)))
+    styling_cell.metadata.tags = ["hide-input"]
+    new_nb.cells.append(styling_cell)
+    
+    # Extract the main title from the first markdown heading
+    # This will become our prominent page header
+    title = "Jupyter Notebook"
+    title_cell_index = None
+    
+    for i, cell in enumerate(nb.cells):
+        if cell.cell_type == "markdown" and cell.source.startswith("# "):
+            lines = cell.source.splitlines()
+            title = lines[0].strip("# ")
+            title_cell_index = i
+            break
+    
+    # Create a styled title section at the top of the presentation
+    title_cell = nbformat.v4.new_code_cell(source=_TMPL_TITLE.format(title=title))
+    title_cell.metadata.tags = ["hide-input"]
+    new_nb.cells.append(title_cell)
+    
+    # Process each cell from the original notebook
+    for i, cell in enumerate(nb.cells):
+        if cell.cell_type == "markdown":
+            # Handle the title cell specially to avoid duplication
+            if i == title_cell_index:
+                lines = cell.source.splitlines()
+                if len(lines) > 1:  # Check if there's content beyond the title
+                    # Extract everything after the main title
+                    remaining_content = '\n'.join(lines[1:])
+                    
+                    # Look for secondary headings to organize content properly
+                    secondary_headings = _SECONDARY_HEADING_RE.findall(remaining_content)
+                    
+                    if secondary_headings:
+                        # Split content at the first secondary heading
+                        parts = _SECONDARY_HEADING_RE.split(remaining_content, 1)
+                        
+                        # The introduction is everything before the first subheading
+                        intro_content = parts[0].strip()
+                        
+                        # Add introduction content with special styling
+                        if intro_content:
+                            new_cell = nbformat.v4.new_code_cell(source=_TMPL_INTRO.format(
+                                comment="Display introduction content with distinctive styling",
+                                html=convert_markdown_to_html(intro_content)))
+                            new_cell.metadata.tags = ["hide-input"]
+                            new_nb.cells.append(new_cell)
+                        
+                        # Add the remaining content as a regular section
+                        rest_content = parts[1] + (parts[2] if len(parts) > 2 else "")
+                        if rest_content.strip():
+                            new_cell = nbformat.v4.new_code_cell(source=_TMPL_SECTION.format(
+                                comment="Display remaining content from title cell",
+                                html=convert_markdown_to_html(rest_content)))
+                            new_cell.metadata.tags = ["hide-input"]
+                            new_nb.cells.append(new_cell)
+                    else:
+                        # No subheadings found - treat all as introduction
+                        if remaining_content.strip():
+                            new_cell = nbformat.v4.new_code_cell(source=_TMPL_INTRO.format(
+                                comment="Display introduction content",
+                                html=convert_markdown_to_html(remaining_content)))
+                            new_cell.metadata.tags = ["hide-input"]
+                            new_nb.cells.append(new_cell)
+            else:
+                # Convert regular markdown cells to styled HTML sections
+                new_cell = nbformat.v4.new_code_cell(source=_TMPL_SECTION.format(
+                    comment="Convert markdown content to styled HTML",
+                    html=convert_markdown_to_html(cell.source)))
                 new_cell.metadata.tags = ["hide-input"]
                 new_nb.cells.append(new_cell)
+            
+        elif cell.cell_type == "code":
+            # Process different types of code cells appropriately
+            builder = _CODE_CELL_BUILDERS[classify_code_cell(cell.source)]
+            new_cell = nbformat.v4.new_code_cell(source=builder(cell.source))
+            new_cell.metadata.tags = ["hide-input"]
+            new_nb.cells.append(new_cell)
     
     # Add a professional footer to complete the presentation
     footer_cell = nbformat.v4.new_code_cell(source="""
@@ -372,12 +496,65 @@ display(HTML(\"\"\"
     footer_cell.metadata.tags = ["hide-input"]
     new_nb.cells.append(footer_cell)
     
-    # Save the transformed notebook
-    with open(output_notebook, 'w', encoding='utf-8') as f:
-        nbformat.write(new_nb, f)
+    return new_nb
+
+def convert_many(pairs, css_path=None, workers=None):
+    """
+    Convert several notebooks in parallel, one worker process per notebook.
     
-    print(f"Conversion complete: {input_notebook} → {output_notebook}")
-    print(f"Run with: voila {output_notebook} --template=material --theme=light")
+    The conversions are independent and CPU-bound, so separate processes
+    scale with the number of cores.
+    
+    Args:
+        pairs (iterable): (input_notebook, output_notebook) path tuples
+        css_path (str, optional): Custom CSS file applied to every notebook
+        workers (int, optional): Number of worker processes, defaults to the CPU count
+    """
+    pairs = list(pairs)
+    inputs = [input_notebook for input_notebook, _ in pairs]
+    outputs = [output_notebook for _, output_notebook in pairs]
+    
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        # Consume the results so that errors in the workers are raised here
+        list(executor.map(partial(convert_notebook_to_voila, css_path=css_path), inputs, outputs))
+
+def read_notebook(path):
+    """
+    Read a notebook from disk and return it as an nbformat version 4 node.
+    
+    The JSON is parsed with orjson, which is considerably faster than the
+    standard library parser used by nbformat.read for large notebooks with
+    embedded outputs. The file is memory-mapped so the parser reads straight
+    from the page cache instead of from an intermediate bytes copy.
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        with memoryview(mm) as data:
+            nb_dict = orjson.loads(data)
+    major, minor = nbformat.reader.get_version(nb_dict)
+    nb = nbformat.versions[major].to_notebook_json(nb_dict, minor=minor)
+    nb = nbformat.convert(nb, 4)
+    _log_if_invalid(nb)
+    return nb
+
+def write_notebook(nb, path):
+    """
+    Validate a notebook and write it to disk, serializing the JSON with orjson.
+    
+    Like nbformat.write, the caller's notebook is left unchanged; transient
+    metadata is stripped from a copy.
+    """
+    _log_if_invalid(nb)
+    nb = strip_transient(copy.deepcopy(nb))
+    with open(path, 'wb') as f:
+        f.write(orjson.dumps(nb, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+        f.write(b'\n')
+
+def _log_if_invalid(nb):
+    """Log schema errors without failing, as nbformat.read and nbformat.write do."""
+    try:
+        nbformat.validate(nb)
+    except nbformat.ValidationError as e:
+        nbformat.get_logger().error("Notebook JSON is invalid: %s", e)
 
 def convert_markdown_to_html(markdown_text):
     """
@@ -386,120 +563,99 @@ def convert_markdown_to_html(markdown_text):
     This function carefully handles mathematical notation, citations, and references
     to ensure proper rendering in the final presentation.
     """
-    # Use unique placeholders to protect math expressions during conversion
-    placeholder_format = "MATH_PLACEHOLDER_{}_TYPE_{}"
+    # Math expressions are protected during conversion by \uE000<index>\uE001 placeholders
     math_blocks = []
     has_math = False  # Track whether this content contains mathematical expressions
     
     # Check for a References section and handle it separately
     references_section = None
-    references_match = re.search(r'^(#+)\s+References:?.*$', markdown_text, re.MULTILINE | re.IGNORECASE)
+    references_match = _REFERENCES_RE.search(markdown_text)
     
     if references_match:
         # Split content at the References heading
-        parts = re.split(r'^(#+\s+References:?.*$)', markdown_text, 1, re.MULTILINE | re.IGNORECASE)
+        parts = _REFERENCES_RE.split(markdown_text, 1)
         
         # Process main content normally, handle references specially
         markdown_text = parts[0]
         references_section = parts[1] + (parts[2] if len(parts) > 2 else "")
     
-    # Extract align environments first - these need special handling for numbering
-    def extract_align_env(match):
+    # Extract align environments, other LaTeX environments (cases, matrices, etc.),
+    # display math ($$...$$) and inline math ($...$) in a single pass
+    def extract_math(match):
         nonlocal math_blocks, has_math
         has_math = True
-        block_id = len(math_blocks)
-        # Convert align to align* to prevent automatic equation numbering
-        content = match.group(0)
-        content = content.replace('\\begin{align}', '\\begin{align*}')
-        content = content.replace('\\end{align}', '\\end{align*}')
-        math_blocks.append(("align", content))
-        return placeholder_format.format(block_id, "align")
-    
-    # Find and extract all align environments
-    pattern = r'\\begin\{align\}(.*?)\\end\{align\}'
-    markdown_text = re.sub(pattern, extract_align_env, markdown_text, flags=re.DOTALL)
-    
-    # Extract other LaTeX environments (cases, matrices, etc.)
-    def extract_other_env(match):
-        nonlocal math_blocks, has_math
-        has_math = True
-        block_id = len(math_blocks)
-        math_blocks.append(("env", match.group(0)))
-        return placeholder_format.format(block_id, "env")
-    
-    # Find and extract all other LaTeX environments
-    pattern = r'\\begin\{([^}]+)\}(.*?)\\end\{\1\}'
-    markdown_text = re.sub(pattern, extract_other_env, markdown_text, flags=re.DOTALL)
-    
-    # Extract display math ($$...$$) blocks
-    def extract_display_math(match):
-        nonlocal math_blocks, has_math
-        has_math = True
-        block_id = len(math_blocks)
-        math_blocks.append(("display", match.group(1)))
-        return placeholder_format.format(block_id, "display")
-    
-    markdown_text = re.sub(r'\$\$(.*?)\$\$', extract_display_math, markdown_text, flags=re.DOTALL)
-    
-    # Extract inline math ($...$) expressions
-    def extract_inline_math(match):
-        nonlocal math_blocks, has_math
-        has_math = True
-        block_id = len(math_blocks)
-        math_blocks.append(("inline", match.group(1)))
-        return placeholder_format.format(block_id, "inline")
-    
-    markdown_text = re.sub(r'(?<!\$)\$([^$\n]+?)\$(?!\$)', extract_inline_math, markdown_text)
+        block_type = match.lastgroup
+        content = match.group(block_type)
+        if block_type == "align":
+            # Convert align to align* to prevent automatic equation numbering
+            content = content.replace('\\begin{align}', '\\begin{align*}')
+            content = content.replace('\\end{align}', '\\end{align*}')
+        math_blocks.append((block_type, content))
+        return f"\uE000{len(math_blocks) - 1}\uE001"
     
-    # Protect parentheses content from MathJax interpretation (AFTER math extraction)
-    markdown_text = re.sub(r'\(([^)]*)\)', r'<span class="notmath">(\1)</span>', markdown_text)
+    # Most cells contain no math at all; substring checks rule that out
+    # without running the regex engine over the text
+    if '$' in markdown_text or '\\begin{' in markdown_text:
+        markdown_text = _MATH_RE.sub(extract_math, markdown_text)
     
     # Convert regular markdown elements to HTML
     markdown_text = process_regular_markdown(markdown_text)
     
+    # Protect parentheses content from MathJax interpretation (AFTER math extraction).
+    # This runs on the rendered HTML with code elements and tags set aside, so only
+    # text is rewritten: the markup added here is neither escaped into code spans
+    # and code blocks nor inserted into attributes such as link URLs
+    if '(' in markdown_text:
+        stashed_html = []
+        
+        def stash_html(match):
+            stashed_html.append(match.group(0))
+            return f"\uE002{len(stashed_html) - 1}\uE003"
+        
+        def restore_html(match):
+            index = int(match.group(1))
+            return stashed_html[index] if index < len(stashed_html) else match.group(0)
+        
+        markdown_text = _HTML_STASH_RE.sub(stash_html, markdown_text)
+        markdown_text = _PARENS_RE.sub(r'<span class="notmath">(\1)</span>', markdown_text)
+        if stashed_html:
+            markdown_text = _HTML_STASH_PLACEHOLDER_RE.sub(restore_html, markdown_text)
+    
     # Protect citation references from being processed as math
     def escape_citation(match):
         # Wrap in span with class to prevent MathJax processing
         return f'<span class="notmath">[{match.group(1)}]</span>'
 
     # Find numerical citation patterns like [1], [2], etc.
-    citation_pattern = r'\[(\d+)\]'
-    markdown_text = re.sub(citation_pattern, escape_citation, markdown_text)
+    markdown_text = _CITATION_RE.sub(escape_citation, markdown_text)
     
     # Process references section with special formatting
     if references_section:
         # Handle basic markdown formatting
         processed_references = references_section
         
-        # Convert headings to HTML
-        processed_references = re.sub(r'^# (.+)$', r'<h1>\1</h1>', processed_references, flags=re.MULTILINE)
-        processed_references = re.sub(r'^## (.+)$', r'<h2>\1</h2>', processed_references, flags=re.MULTILINE)
-        processed_references = re.sub(r'^### (.+)$', r'<h3>\1</h3>', processed_references, flags=re.MULTILINE)
-        
-        # Format numerical citations with special styling
-        processed_references = re.sub(r'\[(\d+)\]', r'<span class="citation-number"><span class="bracket-content">[<em><strong>\1</strong></em>]</span></span>', processed_references)
+        def format_bracket(match):
+            citation_number, bracket_text = match.groups()
+            if citation_number is not None:
+                # Format numerical citations with special styling
+                return f'<span class="citation-number"><span class="bracket-content">[<em><strong>{citation_number}</strong></em>]</span></span>'
+            # Format bracketed descriptive text (like [Computer software])
+            return f'<span class="bracket-content">[<em>{bracket_text}</em>]</span>'
         
-        # Format bracketed descriptive text (like [Computer software])
-        processed_references = re.sub(r'\[([^\]0-9][^\]]*)\]', r'<span class="bracket-content">[<em>\1</em>]</span>', processed_references)
+        # Citations and descriptive brackets are formatted in a single pass
+        processed_references = _REFERENCE_BRACKET_RE.sub(format_bracket, processed_references)
         
         # Protect parentheses in references section too
-        processed_references = re.sub(r'\(([^)]*)\)', r'&#40;\1&#41;', processed_references)
+        processed_references = _PARENS_RE.sub(r'&#40;\1&#41;', processed_references)
         
         # Clean up any escaped HTML characters
         processed_references = processed_references.replace('\\<', '<').replace('\\>', '>').replace('\\/', '/')
         
         # Convert URLs to clickable links
-        processed_references = re.sub(r'(https?://\S+)', r'<a href="\1">\1</a>', processed_references)
+        processed_references = _URL_RE.sub(r'<a href="\1">\1</a>', processed_references)
         
-        # Wrap text in paragraphs while preserving headings
-        paragraphs = []
-        for p in processed_references.split('\n\n'):
-            if p.strip() and not p.strip().startswith('<h'):
-                paragraphs.append(f'<p>{p}</p>')
-            else:
-                paragraphs.append(p)
-        
-        processed_references = '\n'.join(paragraphs)
+        # Render headings and paragraphs around the formatted citations
+        processed_references = _MD(processed_references)
         
         # Wrap references in a special container with MathJax exclusion
         processed_references = f'''<div class="references" data-mathjax="ignore">
@@ -518,25 +674,24 @@ def convert_markdown_to_html(markdown_text):
         markdown_text += processed_references
         
     # Restore all mathematical expressions to their proper LaTeX format
-    for i, (block_type, content) in enumerate(math_blocks):
+    def restore_math(match):
+        index = int(match.group(1))
+        if index >= len(math_blocks):
+            # Literal text that only looks like a placeholder
+            return match.group(0)
+        block_type, content = math_blocks[index]
         # Escape backslashes for proper JavaScript string handling
         escaped_content = content.replace('\\', '\\\\')
         
-        if block_type == "align":
-            # Wrap align environments in display math delimiters
-            replacement = f"$${escaped_content}$$"
-        elif block_type == "env":
-            # Wrap other environments in display math delimiters
-            replacement = f"$${escaped_content}$$"
-        elif block_type == "display":
-            # Wrap display math content
-            replacement = f"$${escaped_content}$$"
-        else:  # inline
+        if block_type == "inline":
             # Wrap inline math content
-            replacement = f"${escaped_content}$"
-        
-        placeholder = placeholder_format.format(i, block_type)
-        markdown_text = markdown_text.replace(placeholder, replacement)
+            return f"${escaped_content}$"
+        # Wrap align, other environments and display math in display math delimiters
+        return f"$${escaped_content}$$"
+    
+    # A single pass over the text replaces every placeholder
+    if math_blocks:
+        markdown_text = _PLACEHOLDER_RE.sub(restore_math, markdown_text)
     
     # Add MathJax reprocessing script only if math content is present
     if has_math:
@@ -552,73 +707,15 @@ if (window.MathJax) {
 
 def process_regular_markdown(text):
     """Convert standard markdown elements to HTML without affecting LaTeX content."""
-    # Convert markdown headings to HTML
-    text = re.sub(r'^# (.+)$', r'<h1>\1</h1>', text, flags=re.MULTILINE)
-    text = re.sub(r'^## (.+)$', r'<h2>\1</h2>', text, flags=re.MULTILINE)
-    text = re.sub(r'^### (.+)$', r'<h3>\1</h3>', text, flags=re.MULTILINE)
-    text = re.sub(r'^#### (.+)$', r'<h4>\1</h4>', text, flags=re.MULTILINE)
-    
-    # Process bullet lists with proper HTML structure
-    lines = text.split('\n')
-    in_list = False
-    in_blockquote = False
-    result = []
-    
-    for i, line in enumerate(lines):
-        # Handle blockquotes
-        if line.strip().startswith('>'):
-            if not in_blockquote:
-                result.append('<blockquote>')
-                in_blockquote = True
-            # Remove markdown blockquote characters and trim whitespace
-            result.append(line.strip().lstrip('>').strip())
-            continue
-        else:
-            if in_blockquote:
-                result.append('</blockquote>')
-                in_blockquote = False
-
-        # Handle lists
-        is_list_item = line.strip().startswith('- ')
-        if is_list_item:
-            if not in_list:
-                result.append('<ul>')
-                in_list = True
-            result.append(f'<li>{line.strip()[2:]}</li>')
-        else:
-            if in_list:
-                result.append('</ul>')
-                in_list = False
-            result.append(line)
-    
-    if in_list:
-        result.append('</ul>')
-    if in_blockquote:
-        result.append('</blockquote>')
-    
-    text = '\n'.join(result)
-    
-    # Convert text formatting
-    text = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', text)  
-    # Italics: only match *…* when it's not immediately inside a literal ()
-    text = re.sub(r'(?<!\()\*(.+?)\*(?!\))', r'<em>\1</em>', text)
-    
-    # Convert markdown links to HTML
-    text = re.sub(r'\[(.+?)\]\((.+?)\)', r'<a href="\2">\1</a>', text)
-    
-    # Wrap text blocks in paragraph tags
-    paragraphs = text.split('\n\n')
-    for i, p in enumerate(paragraphs):
-        trimmed_p = p.strip()
-        if trimmed_p and not trimmed_p.startswith('<') and not trimmed_p.endswith('>'):
-            paragraphs[i] = f'<p>{trimmed_p}</p>'
-    
-    return '\n'.join(paragraphs)
+    # Math expressions have already been replaced by placeholders made of
+    # private-use codepoints and digits, which the markdown parser leaves alone
+    return _MD(text)
 
 def indent_code(code, spaces=4):
     """Add consistent indentation to code blocks for proper formatting."""
     prefix = ' ' * spaces
-    return '\n'.join(prefix + line for line in code.split('\n'))
+    # Prefixing every line, blank ones included, is a single str.replace
+    return prefix + code.replace('\n', '\n' + prefix)
 
 def contains_status_display(code):
     """
@@ -628,7 +725,7 @@ def contains_status_display(code):
     and should be preserved as-is in the presentation.
     """
     # Look for display(HTML patterns with background color styling
-    if re.search(r'display\s*\(\s*HTML\s*\(\s*[frf]?""".*background:\s*#', code, re.DOTALL):
+    if _STATUS_DISPLAY_RE.search(code):
         return True
     return False
 
@@ -639,19 +736,12 @@ def is_import_or_setup_cell(code):
     These cells are necessary for functionality but don't need to be
     prominently displayed in the presentation.
     """
-    # Check for import statements
-    if re.search(r'^\s*import\s+|^\s*from\s+.*\s+import', code, re.MULTILINE):
-        return True
-    
-    # Check for package installation commands
-    if re.search(r'^\s*!pip\s+|^\s*!conda\s+', code, re.MULTILINE):
+    # Check for import statements and package installation commands
+    if _SETUP_RE.search(code):
         return True
     
     # Check for matplotlib configuration
-    if '%matplotlib' in code:
-        return True
-    
-    return False
+    return '%matplotlib' in code
 
 def contains_interactive_plot(code):
     """
@@ -660,36 +750,72 @@ def contains_interactive_plot(code):
     These cells need special handling to provide context and ensure
     proper rendering in the Voila presentation.
     """
-    # Check for various interactive widget patterns
-    if re.search(r'interact\s*\(', code, re.MULTILINE):
-        return True
-    if re.search(r'ipywidgets\.', code, re.MULTILINE):
-        return True
-    if re.search(r'FloatSlider|IntSlider|Dropdown|Button|Checkbox|SelectionSlider|Play|DatePicker', code, re.MULTILINE):
-        return True
-    if re.search(r'ThermalWidget', code, re.MULTILINE):
-        return True
-    if re.search(r'@interact|interactive', code, re.MULTILINE):
-        return True
-    if re.search(r'widgets\.|HBox|VBox|Tab|Accordion', code, re.MULTILINE):
-        return True
-    if '%matplotlib widget' in code:
-        return True
-    # Check for widget observation patterns (common in interactive applications)
-    if re.search(r'\.observe\s*\(', code, re.MULTILINE):
-        return True
-    # Check for widget display patterns
-    if re.search(r'display\s*\(\s*\w*Box\s*\(', code, re.MULTILINE):
-        return True
-    return False
+    # A single scan over the source covers every widget pattern
+    return '%matplotlib widget' in code or _INTERACTIVE_RE.search(code) is not None
+
+def classify_code_cell(code):
+    """
+    Determine how a code cell should be presented.
+    
+    Returns one of 'no_output', 'status', 'setup', 'interactive' or 'regular'.
+    The detectors are tried in order of precedence and the first hit wins,
+    so most cells are settled by the cheap checks at the front.
+    """
+    if has_no_output_comment(code):
+        return 'no_output'
+    if contains_status_display(code):
+        return 'status'
+    if is_import_or_setup_cell(code):
+        return 'setup'
+    if contains_interactive_plot(code):
+        return 'interactive'
+    return 'regular'
+
+@lru_cache(maxsize=8)
+def _read_css_cached(css_path, mtime):
+    """Read a CSS file once per modification time, so batch conversions reuse it."""
+    with open(css_path, 'r', encoding='utf-8') as f:
+        return f.read()
 
 def load_css(css_path):
     """Load custom CSS styling from an external file if provided."""
     if css_path and os.path.exists(css_path):
-        with open(css_path, 'r', encoding='utf-8') as f:
-            return f.read()
+        return _read_css_cached(css_path, os.path.getmtime(css_path))
     return DEFAULT_CSS
 
+# Converted notebooks are cached here, keyed by a hash of everything that
+# determines the output
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'nfdi-voila')
+
+@lru_cache(maxsize=1)
+def _converter_source():
+    """Source of this module, so that changes to the converter invalidate the cache."""
+    with open(__file__, 'rb') as f:
+        return f.read()
+
+def _cache_file(input_notebook, css_path):
+    """Path of the cached conversion for a notebook, its styling and this converter."""
+    digest = blake2b(digest_size=16)
+    with open(input_notebook, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        digest.update(mm)
+    digest.update(b'\0')
+    digest.update(load_css(css_path).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(_converter_source())
+    return os.path.join(CACHE_DIR, f'{digest.hexdigest()}.ipynb')
+
+def _store_in_cache(output_notebook, cache_file):
+    """Copy a converted notebook into the cache; an unwritable cache is not an error."""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Copy under a temporary name first so that parallel conversions never
+        # pick up a partially written file
+        tmp_file = f'{cache_file}.{os.getpid()}.tmp'
+        shutil.copyfile(output_notebook, tmp_file)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass
+
 # Default CSS styling that creates a professional, responsive presentation layout
 DEFAULT_CSS = """
     /* Main container with full-width responsive design */
@@ -0,0 +1,377 @@
+# loadlib.py
+import asyncio
+import concurrent.futures
+import httpx
+from hdrh.histogram import HdrHistogram
+import orjson
+import os
+import requests
+import statistics
+from collections import namedtuple
+from dataclasses import dataclass, field
+from requests.adapters import HTTPAdapter
+from time import perf_counter, time
+from urllib3.util.retry import Retry
+
+# One session shared by all load test threads, so requests reuse keep-alive
+# connections instead of opening a new TCP connection each time.
+# pool_maxsize stays well above the largest thread pool used by the tests
+# (10 workers) so worker threads never wait for a free connection slot.
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    # Retry briefly on gateway errors, but still hand the final response
+    # back so its status shows up in the results
+    max_retries=Retry(total=2, backoff_factor=0.05, status_forcelist=[502, 503, 504], raise_on_status=False),
+))
+
+# Pending requests, including those in flight, are capped at PENDING_FACTOR
+# times the concurrency, so at most (PENDING_FACTOR - 1) * concurrency wait
+# behind the in-flight ones. A request that can't get a slot within
+# BACKPRESSURE_TIMEOUT is recorded as 'backpressure' instead of piling up
+# behind saturated connections
+PENDING_FACTOR = 2
+BACKPRESSURE_TIMEOUT = 0.5
+
+INFO_URL = "http://localhost:8000/api/info"
+
+# Simulation parameters only depend on request_id % 60 (lcm of 10, 5 and 6),
+# so every distinct body is serialized once up front
+BODIES = [
+    orjson.dumps({
+        "ms_id": i % 10,  # Cycle through first 10 microstructures
+        "kappa1": 2.0 + (i % 5),  # Vary between 2-6
+        "alpha": 30.0 + (i % 6) * 10  # Vary between 30-80 degrees
+    })
+    for i in range(60)
+]
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Per-test stats are appended here as JSON lines, one file per test
+STATS_DIR = os.environ.get("LOADTEST_STATS_DIR", "loadtest_results")
+
+# Gunicorn worker count of the server under test (see README)
+NUM_WORKERS = int(os.environ.get("NUM_WORKERS", 2))
+
+# CPUs the load generator runs on; start gunicorn on the remaining ones
+# (e.g. taskset -c 2-7 gunicorn ...) so client and server don't share cores
+LOADGEN_CPUS = os.environ.get("LOADGEN_CPUS", "0,1")
+
+
+def async_client():
+    """Pooled HTTP client for the asyncio load generators"""
+    return httpx.AsyncClient(limits=httpx.Limits(max_connections=200, keepalive_expiry=30))
+
+
+def write_stats(name, record):
+    """Append one run's stats as a JSON line to STATS_DIR/<name>.jsonl"""
+    os.makedirs(STATS_DIR, exist_ok=True)
+    line = orjson.dumps({'ts': time(), **record}, option=orjson.OPT_NON_STR_KEYS)
+    with open(os.path.join(STATS_DIR, f"{name}.jsonl"), "ab") as f:
+        f.write(line + b"\n")
+
+
+def parse_cpu_list(spec):
+    """Parse a taskset-style cpu list such as "0,1" or "0-3,6" into a set"""
+    cpus = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            first, _, last = part.partition("-")
+            cpus.update(range(int(first), int(last or first) + 1))
+        except ValueError:
+            raise ValueError(f"LOADGEN_CPUS: invalid cpu entry {part!r} in {spec!r}") from None
+    return cpus
+
+
+def pin_load_generator(cpus=None):
+    """Restrict this process to cpus (default: LOADGEN_CPUS) where the OS supports CPU affinity"""
+    if not hasattr(os, "sched_setaffinity"):
+        return
+    if cpus is None:
+        cpus = parse_cpu_list(LOADGEN_CPUS)
+    cpus = set(cpus) & os.sched_getaffinity(0)
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+
+
+def _warmup_request(_):
+    try:
+        # A fresh connection per request, so the kernel can hand it to any worker
+        requests.get(INFO_URL, headers={"Connection": "close"}, timeout=5)
+    except requests.RequestException:
+        pass
+
+
+def warmup(rounds=4):
+    """Hit /api/info a few times per worker so lazy worker start-up isn't measured"""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor:
+        list(executor.map(_warmup_request, range(rounds * NUM_WORKERS)))
+
+
+def get_info(client, i):
+    """run_scenario() request function for the /api/info endpoint"""
+    return client.get(INFO_URL, timeout=10)
+
+
+RawResponse = namedtuple('RawResponse', 'status_code headers content')
+
+
+class _ConnectionDropped(ConnectionError):
+    """The server closed a connection before sending any of the response"""
+
+
+class RawHTTPClient:
+    """Minimal keep-alive HTTP/1.1 GET client over asyncio streams
+
+    Skips httpx's URL parsing, cookie, redirect and response wrapping layers for
+    hammering a fixed local endpoint. Idle connections are kept and reused
+    when the response is framed by Content-Length, as the app's JSON responses
+    are; close-delimited bodies are read to EOF and the connection is dropped,
+    and chunked responses are rejected. Idle connections the server has closed
+    are skipped, and a request whose reused connection drops before any
+    response bytes arrive is retried once on a fresh one.
+    """
+
+    def __init__(self, host="localhost", port=8000):
+        self.host = host
+        self.port = port
+        self._idle = []
+        # Request bytes are crafted once per path and resent verbatim
+        self._requests = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            await self._discard(writer)
+
+    @staticmethod
+    async def _discard(writer):
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+    async def get(self, path, timeout=10):
+        return await asyncio.wait_for(self._get(path), timeout)
+
+    async def _get(self, path):
+        request = self._requests.get(path)
+        if request is None:
+            request = self._requests[path] = (
+                f"GET {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nConnection: keep-alive\r\n\r\n".encode()
+            )
+        while self._idle:
+            reader, writer = self._idle.pop()
+            # Skip connections the server closed while they sat idle
+            if reader.at_eof() or writer.is_closing():
+                await self._discard(writer)
+                continue
+            try:
+                return await self._exchange(reader, writer, path, request)
+            except _ConnectionDropped:
+                # Closed before it answered (keep-alive expiry, worker recycling);
+                # retry once on a fresh connection, as httpx and urllib3 do
+                break
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        return await self._exchange(reader, writer, path, request)
+
+    async def _exchange(self, reader, writer, path, request):
+        try:
+            try:
+                writer.write(request)
+                head = await reader.readuntil(b"\r\n\r\n")
+            except asyncio.IncompleteReadError as exc:
+                if exc.partial:
+                    raise
+                raise _ConnectionDropped(f"connection closed before responding to {path}") from exc
+            except ConnectionError as exc:
+                raise _ConnectionDropped(f"connection lost before responding to {path}") from exc
+            status_line, *lines = head.decode('latin-1').split("\r\n")
+            headers = {}
+            for line in lines:
+                if line:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+            if 'content-length' in headers:
+                content = await reader.readexactly(int(headers['content-length']))
+                reusable = headers.get('connection', '').lower() != 'close'
+            elif 'chunked' in headers.get('transfer-encoding', '').lower():
+                raise ValueError(f"chunked response from {path} is not supported")
+            else:
+                # The body runs until the server closes the connection
+                content = await reader.read()
+                reusable = False
+        except BaseException:
+            await self._discard(writer)
+            raise
+        if reusable:
+            self._idle.append((reader, writer))
+        else:
+            await self._discard(writer)
+        return RawResponse(int(status_line.split()[1]), headers, content)
+
+
+def get_info_raw(client, i):
+    """run_scenario() request function for /api/info on a RawHTTPClient"""
+    return client.get("/api/info", timeout=10)
+
+
+async def acquire_slot(semaphore, timeout=BACKPRESSURE_TIMEOUT):
+    """Wait up to timeout for a pending-request slot; False means the client is saturated"""
+    try:
+        await asyncio.wait_for(semaphore.acquire(), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+def parse_worker_pid(resp):
+    """Return the worker_pid field from an /api/info response body"""
+    return orjson.loads(resp.content).get('worker_pid')
+
+
+def header_worker_pid(resp):
+    """Return the PID of the worker that served resp, from its X-Worker-PID header"""
+    pid = resp.headers.get('x-worker-pid')
+    return int(pid) if pid else None
+
+
+def latency_percentiles(samples):
+    """Return (p50, p95, p99) of a list of latencies"""
+    if len(samples) < 2:
+        return (samples[0],) * 3 if samples else (0, 0, 0)
+    cuts = statistics.quantiles(samples, n=100)
+    return cuts[49], cuts[94], cuts[98]
+
+
+def latency_histogram():
+    """Fixed-memory latency histogram in microseconds (1 µs .. 60 s, 3 significant digits)"""
+    return HdrHistogram(1, 60_000_000, 3)
+
+
+def histogram_percentiles(hist):
+    """Return (p50, p95, p99) in seconds from a latency_histogram()"""
+    return tuple(hist.get_value_at_percentile(p) / 1e6 for p in (50, 95, 99))
+
+
+@dataclass
+class Stats:
+    """Aggregated outcome of one run_scenario() call"""
+    name: str
+    total: int = 0
+    successful: int = 0
+    failed: int = 0
+    backpressure: int = 0
+    latency_sum: float = 0.0
+    elapsed: float = 0.0
+    histogram: HdrHistogram = field(default_factory=latency_histogram)
+    worker_distribution: dict = field(default_factory=dict)
+
+    def record(self, resp, latency):
+        self.total += 1
+        if resp.status_code != 200:
+            self.failed += 1
+            return
+        self.successful += 1
+        self.latency_sum += latency
+        self.histogram.record_value(max(1, int(latency * 1e6)))
+        pid = header_worker_pid(resp)
+        if pid:
+            self.worker_distribution[pid] = self.worker_distribution.get(pid, 0) + 1
+
+    def record_failure(self, backpressure=False):
+        self.total += 1
+        self.failed += 1
+        if backpressure:
+            self.backpressure += 1
+
+    @property
+    def mean_latency(self):
+        return self.latency_sum / self.successful if self.successful else 0
+
+    @property
+    def requests_per_second(self):
+        return self.successful / self.elapsed if self.elapsed else 0
+
+    def percentiles(self):
+        return histogram_percentiles(self.histogram)
+
+    def summary(self):
+        """Stats as a plain dict for write_stats()"""
+        p50, p95, p99 = self.percentiles()
+        return {
+            'total': self.total,
+            'successful': self.successful,
+            'failed': self.failed,
+            'backpressure': self.backpressure,
+            'elapsed': self.elapsed,
+            'rps': self.requests_per_second,
+            'mean': self.mean_latency,
+            'p50': p50,
+            'p95': p95,
+            'p99': p99,
+            'worker_distribution': self.worker_distribution,
+        }
+
+
+async def run_scenario(name, request_fn, concurrency, total, client=None):
+    """Drive request_fn(client, i) against the server and return its Stats
+
+    Sends total requests with at most concurrency in flight and
+    PENDING_FACTOR * concurrency pending in all, so (PENDING_FACTOR - 1) *
+    concurrency queue behind the in-flight ones; requests that can't get a
+    pending slot within BACKPRESSURE_TIMEOUT count as failed. Pass client to share one
+    connection pool across scenarios.
+    """
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be at least 1, got {concurrency}")
+    if total is None or total < 0:
+        raise ValueError(f"total must be a non-negative request count, got {total}")
+    stats = Stats(name)
+    in_flight = asyncio.Semaphore(concurrency)
+    pending = asyncio.Semaphore(PENDING_FACTOR * concurrency)
+
+    async def send(client, i):
+        start = perf_counter()
+        try:
+            resp = await request_fn(client, i)
+        except Exception:
+            stats.record_failure()
+        else:
+            stats.record(resp, perf_counter() - start)
+
+    async def fire(client, i):
+        try:
+            async with in_flight:
+                await send(client, i)
+        finally:
+            pending.release()
+
+    async def dispatch(client):
+        tasks = []
+        for i in range(total):
+            if not await acquire_slot(pending):
+                stats.record_failure(backpressure=True)
+                continue
+            tasks.append(asyncio.create_task(fire(client, i)))
+        await asyncio.gather(*tasks)
+
+    start = perf_counter()
+    if client is None:
+        async with async_client() as client:
+            await dispatch(client)
+    else:
+        await dispatch(client)
+    stats.elapsed = perf_counter() - start
+    return stats
@@ -1,55 +1,29 @@
 # test_force_load_balance.py
-import requests
-import concurrent.futures
-import time
-from collections import Counter
+from loadlib import async_client, get_info, parse_worker_pid, pin_load_generator, run_scenario, warmup, write_stats
+import asyncio
+from time import perf_counter
 
-def overwhelm_single_worker():
+async def overwhelm_single_worker(client=None):
     """Send many concurrent requests to force load balancing"""
     print("🔥 Overwhelming single worker to force load balancing...")
     
-    def make_request(i):
-        try:
-            start = time.time()
-            resp = requests.get("http://localhost:8000/api/info", timeout=10)
-            end = time.time()
-            
-            if resp.status_code == 200:
-                return {
-                    'id': i,
-                    'worker_pid': resp.json().get('worker_pid'),
-                    'response_time': end - start,
-                    'status': 'success'
-                }
-            else:
-                return {'id': i, 'status': f'error_{resp.status_code}'}
-        except Exception as e:
-            return {'id': i, 'status': f'timeout'}
-    
     # Send 30 requests simultaneously to overwhelm worker 970
     print("Sending 30 concurrent requests...")
-    start_time = time.time()
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=30) as executor:
-        futures = [executor.submit(make_request, i) for i in range(30)]
-        results = [future.result() for future in concurrent.futures.as_completed(futures)]
-    
-    total_time = time.time() - start_time
-    
-    # Analyze results
-    successful = [r for r in results if r.get('status') == 'success']
-    worker_pids = [r['worker_pid'] for r in successful if r.get('worker_pid')]
-    worker_distribution = Counter(worker_pids)
+    stats = await run_scenario("overwhelm_single_worker", get_info, concurrency=30, total=30, client=client)
+    worker_distribution = stats.worker_distribution
+    p50, p95, p99 = stats.percentiles()
     
     print(f"\n📊 Load Balancing Test Results:")
     print(f"   Total requests: 30")
-    print(f"   Successful: {len(successful)}")
-    print(f"   Total time: {total_time:.2f}s")
-    print(f"   Unique workers used: {len(set(worker_pids))}")
-    print(f"   Worker PIDs found: {sorted(set(worker_pids))}")
-    print(f"   Worker distribution: {dict(worker_distribution)}")
+    print(f"   Successful: {stats.successful}")
+    print(f"   Total time: {stats.elapsed:.2f}s")
+    print(f"   Latency p50/p95/p99: {p50:.3f}s / {p95:.3f}s / {p99:.3f}s")
+    print(f"   Unique workers used: {len(worker_distribution)}")
+    print(f"   Worker PIDs found: {sorted(worker_distribution)}")
+    print(f"   Worker distribution: {worker_distribution}")
+    write_stats(stats.name, stats.summary())
     
-    if len(set(worker_pids)) > 1:
+    if len(worker_distribution) > 1:
         print("✅ SUCCESS: Multiple workers handling requests!")
         print(f"   Worker 970: {worker_distribution.get(970, 0)} requests")
         print(f"   Worker 971: {worker_distribution.get(971, 0)} requests")
@@ -58,45 +32,72 @@ def overwhelm_single_worker():
         print("⚠️  Still only one worker responding")
         return False
 
-def sustained_load_test():
+async def sustained_load_test(client=None, target_rps=50):
     """Sustained load over time to force worker switching"""
+    if client is None:
+        async with async_client() as client:
+            return await sustained_load_test(client, target_rps)
+    
     print("\n🔄 Sustained load test...")
     
     worker_pids = set()
     request_count = 0
+    done = asyncio.Event()
     
-    # Send requests for 10 seconds
-    end_time = time.time() + 10
-    
-    while time.time() < end_time:
+    async def sample_worker(client):
+        nonlocal request_count
         try:
-            resp = requests.get("http://localhost:8000/api/info", timeout=2)
+            resp = await client.get("http://localhost:8000/api/info", timeout=2)
             if resp.status_code == 200:
-                pid = resp.json().get('worker_pid')
-                worker_pids.add(pid)
+                worker_pids.add(parse_worker_pid(resp))
                 request_count += 1
                 
                 if len(worker_pids) > 1:
-                    print(f"✅ Multiple workers detected: {worker_pids}")
-                    break
+                    done.set()
                     
         except:
             pass
-        
-        time.sleep(0.1)
     
+    # Send requests at target_rps for 10 seconds, without waiting on responses.
+    # Sends are scheduled on a fixed timeline so slow responses don't lower the rate.
+    interval = 1 / target_rps
+    deadline = perf_counter() + 10
+    next_send = perf_counter()
+    tasks = []
+    
+    while perf_counter() < deadline and not done.is_set():
+        tasks.append(asyncio.create_task(sample_worker(client)))
+        next_send += interval
+        await asyncio.sleep(max(0, next_send - perf_counter()))
+    await asyncio.gather(*tasks)
+    
+    if len(worker_pids) > 1:
+        print(f"✅ Multiple workers detected: {worker_pids}")
     print(f"📊 Sustained test: {request_count} requests, {len(worker_pids)} workers")
+    write_stats("sustained_load_test", {
+        'target_rps': target_rps,
+        'requests': request_count,
+        'worker_pids': sorted(worker_pids)
+    })
     return len(worker_pids) > 1
 
+async def run_tests():
+    """Run both tests on one event loop, sharing a single connection pool"""
+    async with async_client() as client:
+        # Test 1: Overwhelm with concurrent requests
+        concurrent_success = await overwhelm_single_worker(client)
+        
+        # Test 2: Sustained load
+        sustained_success = await sustained_load_test(client)
+    return concurrent_success, sustained_success
+
 if __name__ == "__main__":
     print("🎯 Force Load Balancing Test")
     print("=" * 40)
+    pin_load_generator()
+    warmup()
     
-    # Test 1: Overwhelm with concurrent requests
-    concurrent_success = overwhelm_single_worker()
-    
-    # Test 2: Sustained load
-    sustained_success = sustained_load_test()
+    concurrent_success, sustained_success = asyncio.run(run_tests())
     
     print(f"\n🎯 SUMMARY:")
     if concurrent_success or sustained_success:
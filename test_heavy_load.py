@@ -1,54 +1,27 @@
 # test_heavy_load.py
-import requests
-import concurrent.futures
-import time
-from collections import Counter
+from loadlib import get_info, pin_load_generator, run_scenario, warmup, write_stats
+import asyncio
 
-def test_heavy_concurrent_load():
+async def test_heavy_concurrent_load():
     """Test with heavier concurrent load"""
     print("🔥 Testing heavy concurrent load...")
     
-    def make_info_request(i):
-        start = time.time()
-        try:
-            resp = requests.get("http://localhost:8000/api/info", timeout=10)
-            return {
-                'id': i,
-                'status': resp.status_code,
-                'worker_pid': resp.json().get('worker_pid'),
-                'response_time': time.time() - start
-            }
-        except Exception as e:
-            return {
-                'id': i,
-                'status': 'error',
-                'error': str(e),
-                'response_time': time.time() - start
-            }
-    
-    # Test with 50 concurrent requests
-    start_time = time.time()
-    with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
-        futures = [executor.submit(make_info_request, i) for i in range(50)]
-        results = [future.result() for future in concurrent.futures.as_completed(futures)]
-    
-    total_time = time.time() - start_time
-    
-    # Analyze results
-    successful = [r for r in results if r['status'] == 200]
-    failed = [r for r in results if r['status'] != 200]
-    worker_distribution = Counter(r['worker_pid'] for r in successful if r.get('worker_pid'))
-    
-    avg_response_time = sum(r['response_time'] for r in successful) / len(successful) if successful else 0
+    # Test with 50 requests, 20 in flight at a time
+    stats = await run_scenario("heavy_concurrent_load", get_info, concurrency=20, total=50)
+    p50, p95, p99 = stats.percentiles()
     
     print(f"📊 Heavy Load Test Results:")
     print(f"   Total requests: 50")
-    print(f"   Successful: {len(successful)}")
-    print(f"   Failed: {len(failed)}")
-    print(f"   Total time: {total_time:.2f}s")
-    print(f"   Average response time: {avg_response_time:.3f}s")
-    print(f"   Worker distribution: {dict(worker_distribution)}")
-    print(f"   Requests per second: {len(successful)/total_time:.1f}")
+    print(f"   Successful: {stats.successful}")
+    print(f"   Failed: {stats.failed} ({stats.backpressure} rejected by client backpressure)")
+    print(f"   Total time: {stats.elapsed:.2f}s")
+    print(f"   Average response time: {stats.mean_latency:.3f}s")
+    print(f"   Latency p50/p95/p99: {p50:.3f}s / {p95:.3f}s / {p99:.3f}s")
+    print(f"   Worker distribution: {stats.worker_distribution}")
+    print(f"   Requests per second: {stats.requests_per_second:.1f}")
+    write_stats(stats.name, stats.summary())
 
 if __name__ == "__main__":
-    test_heavy_concurrent_load()
\ No newline at end of file
+    pin_load_generator()
+    warmup()
+    asyncio.run(test_heavy_concurrent_load())
\ No newline at end of file
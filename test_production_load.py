@@ -1,5 +1,6 @@
 # test_production_load.py
-import requests
+from loadlib import BODIES, JSON_HEADERS, SESSION, async_client, header_worker_pid, parse_worker_pid, pin_load_generator, warmup, write_stats
+import asyncio
 import concurrent.futures
 import time
 import json
@@ -7,7 +8,7 @@ import json
 def get_captcha_token():
     """Get a valid CAPTCHA token"""
     # Get CAPTCHA
-    captcha_resp = requests.get("http://localhost:8000/api/captcha")
+    captcha_resp = SESSION.get("http://localhost:8000/api/captcha")
     if captcha_resp.status_code != 200:
         return None
     
@@ -23,16 +24,11 @@ def get_captcha_token():
 def test_simulation_with_captcha(request_id):
     """Test simulation with proper CAPTCHA (manual step required)"""
     try:
-        sim_data = {
-            "ms_id": request_id % 10,
-            "kappa1": 2.0 + (request_id % 5),
-            "alpha": 30.0 + (request_id % 6) * 10
-        }
-        
         # This will fail due to CAPTCHA requirement - that's expected!
-        response = requests.post(
+        response = SESSION.post(
             "http://localhost:8000/api/simulate",
-            json=sim_data,
+            data=BODIES[request_id % 60],
+            headers=JSON_HEADERS,
             timeout=30
         )
         
@@ -48,23 +44,28 @@ def test_simulation_with_captcha(request_id):
             'error': str(e)
         }
 
-def test_redis_captcha_sharing():
+async def test_redis_captcha_sharing():
     """Test that CAPTCHA data is shared between workers via Redis"""
     print("🧪 Testing Redis CAPTCHA sharing between workers...")
     
-    # Get multiple CAPTCHAs and see if they persist across workers
+    # Get multiple CAPTCHAs at once and see if they persist across workers.
+    # Each response names the worker that created it in X-Worker-PID.
+    async with async_client() as client:
+        captcha_resps = await asyncio.gather(*[client.get("http://localhost:8000/api/captcha") for _ in range(5)])
+    
     captcha_ids = []
-    for i in range(5):
-        resp = requests.get("http://localhost:8000/api/info")
-        worker_pid = resp.json().get('worker_pid')
-        
-        captcha_resp = requests.get("http://localhost:8000/api/captcha")
+    for captcha_resp in captcha_resps:
+        worker_pid = header_worker_pid(captcha_resp)
         if captcha_resp.status_code == 200:
             captcha_id = captcha_resp.json()['captcha_id']
             captcha_ids.append((captcha_id, worker_pid))
             print(f"   CAPTCHA {captcha_id[:8]}... created by worker {worker_pid}")
     
     print(f"✅ Created {len(captcha_ids)} CAPTCHAs across workers")
+    write_stats("redis_captcha_sharing", {
+        'captchas': len(captcha_ids),
+        'worker_pids': sorted(set(pid for _, pid in captcha_ids if pid))
+    })
     return len(set(pid for _, pid in captcha_ids)) > 1  # Multiple workers used
 
 def test_concurrent_info_requests():
@@ -72,26 +73,31 @@ def test_concurrent_info_requests():
     print("🧪 Testing concurrent info requests...")
     
     with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [executor.submit(lambda i: requests.get("http://localhost:8000/api/info").json(), i) for i in range(20)]
-        results = [future.result() for future in concurrent.futures.as_completed(futures)]
+        results = list(executor.map(lambda i: parse_worker_pid(SESSION.get("http://localhost:8000/api/info")), range(20)))
     
-    worker_pids = [r.get('worker_pid') for r in results if r.get('worker_pid')]
+    worker_pids = [pid for pid in results if pid]
     unique_workers = len(set(worker_pids))
     
     print(f"✅ {len(results)} requests completed")
     print(f"🔄 Used {unique_workers} unique workers: {set(worker_pids)}")
+    write_stats("concurrent_info_requests", {
+        'requests': len(results),
+        'worker_pids': sorted(set(worker_pids))
+    })
     
     return unique_workers > 1
 
 if __name__ == "__main__":
     print("🏭 Production-like Multi-Worker Test with Redis")
     print("=" * 50)
+    pin_load_generator()
+    warmup()
     
     # Test 1: Worker distribution
     multi_worker = test_concurrent_info_requests()
     
     # Test 2: Redis CAPTCHA sharing
-    redis_sharing = test_redis_captcha_sharing()
+    redis_sharing = asyncio.run(test_redis_captcha_sharing())
     
     # Test 3: CAPTCHA protection (will fail - expected)
     print("\n🔒 Testing CAPTCHA protection...")
@@ -1,9 +1,9 @@
 # test_simulation_load.py
-import requests
+from loadlib import BODIES, JSON_HEADERS, SESSION, RawHTTPClient, get_info_raw, header_worker_pid, latency_percentiles, pin_load_generator, run_scenario, warmup, write_stats
+import asyncio
 import concurrent.futures
-import time
+from time import perf_counter
 import json
-from collections import Counter
 
 def solve_captcha_and_get_token():
     """Get a CAPTCHA token for testing"""
@@ -11,7 +11,7 @@ def solve_captcha_and_get_token():
     # This is a simplified version - in real production you'd solve the CAPTCHA
     try:
         # Get a CAPTCHA
-        captcha_resp = requests.get("http://localhost:8000/api/captcha", timeout=5)
+        captcha_resp = SESSION.get("http://localhost:8000/api/captcha", timeout=5)
         if captcha_resp.status_code == 200:
             captcha_data = captcha_resp.json()
             # For testing, we can't auto-solve CAPTCHA, so we'll test without it
@@ -23,28 +23,21 @@ def solve_captcha_and_get_token():
 def test_simulation_request(request_id):
     """Test a single simulation request"""
     try:
-        start_time = time.time()
-        
-        # Simulation parameters
-        sim_data = {
-            "ms_id": request_id % 10,  # Cycle through first 10 microstructures
-            "kappa1": 2.0 + (request_id % 5),  # Vary between 2-6
-            "alpha": 30.0 + (request_id % 6) * 10  # Vary between 30-80 degrees
-        }
+        start_time = perf_counter()
         
         # Make the request (will fail due to CAPTCHA, but tests the endpoint)
-        response = requests.post(
+        response = SESSION.post(
             "http://localhost:8000/api/simulate",
-            json=sim_data,
+            data=BODIES[request_id % 60],
+            headers=JSON_HEADERS,
             timeout=30
         )
         
-        end_time = time.time()
+        end_time = perf_counter()
         response_time = end_time - start_time
         
-        # Check worker info to see distribution
-        info_resp = requests.get("http://localhost:8000/api/info", timeout=5)
-        worker_pid = info_resp.json().get('worker_pid') if info_resp.status_code == 200 else None
+        # The worker that served the POST stamps its PID on every response
+        worker_pid = header_worker_pid(response)
         
         return {
             'request_id': request_id,
@@ -59,7 +52,7 @@ def test_simulation_request(request_id):
         return {
             'request_id': request_id,
             'error': str(e),
-            'response_time': time.time() - start_time if 'start_time' in locals() else None,
+            'response_time': perf_counter() - start_time if 'start_time' in locals() else None,
             'success': False
         }
 
@@ -67,88 +60,101 @@ def test_concurrent_simulations(num_requests=10, max_workers=5):
     """Test concurrent simulation requests"""
     print(f"🧪 Testing {num_requests} concurrent simulation requests (CAPTCHA protected)...")
     
-    start_time = time.time()
+    start_time = perf_counter()
     
     with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(test_simulation_request, i) for i in range(num_requests)]
-        results = [future.result() for future in concurrent.futures.as_completed(futures)]
-    
-    total_time = time.time() - start_time
-    
-    # Analyze results
-    successful_results = [r for r in results if r.get('success', False)]
-    captcha_blocked = [r for r in results if r.get('captcha_protected', False)]
-    failed_results = [r for r in results if not r.get('success', False) and not r.get('captcha_protected', False)]
-    
-    # Worker distribution
-    worker_pids = [r['worker_pid'] for r in results if r.get('worker_pid')]
-    worker_distribution = Counter(worker_pids)
+        results = list(executor.map(test_simulation_request, range(num_requests)))
+    
+    total_time = perf_counter() - start_time
+    
+    # Analyze results in a single pass
+    successful_results = 0
+    captcha_blocked = 0
+    failed_results = 0
+    latency_sum = 0.0
+    response_times = []
+    worker_distribution = {}
+    for r in results:
+        if r.get('success', False):
+            successful_results += 1
+        elif r.get('captcha_protected', False):
+            captcha_blocked += 1
+        else:
+            failed_results += 1
+        
+        pid = r.get('worker_pid')
+        if pid:
+            worker_distribution[pid] = worker_distribution.get(pid, 0) + 1
+        
+        response_time = r.get('response_time')
+        if response_time:
+            latency_sum += response_time
+            response_times.append(response_time)
     
-    # Response times
-    response_times = [r['response_time'] for r in results if r.get('response_time')]
-    avg_response_time = sum(response_times) / len(response_times) if response_times else 0
+    avg_response_time = latency_sum / len(response_times) if response_times else 0
+    p50, p95, p99 = latency_percentiles(response_times)
     
     print(f"📊 Simulation Load Test Results:")
     print(f"   Total requests: {num_requests}")
-    print(f"   Successful simulations: {len(successful_results)}")
-    print(f"   CAPTCHA protected (expected): {len(captcha_blocked)}")
-    print(f"   Failed requests: {len(failed_results)}")
+    print(f"   Successful simulations: {successful_results}")
+    print(f"   CAPTCHA protected (expected): {captcha_blocked}")
+    print(f"   Failed requests: {failed_results}")
     print(f"   Total time: {total_time:.2f}s")
     print(f"   Average response time: {avg_response_time:.3f}s")
-    print(f"   Worker distribution: {dict(worker_distribution)}")
+    print(f"   Latency p50/p95/p99: {p50:.3f}s / {p95:.3f}s / {p99:.3f}s")
+    print(f"   Worker distribution: {worker_distribution}")
     print(f"   Requests per second: {len(results)/total_time:.1f}")
+    write_stats("concurrent_simulations", {
+        'total': num_requests,
+        'successful': successful_results,
+        'captcha_protected': captcha_blocked,
+        'failed': failed_results,
+        'elapsed': total_time,
+        'rps': len(results) / total_time,
+        'mean': avg_response_time,
+        'p50': p50,
+        'p95': p95,
+        'p99': p99,
+        'worker_distribution': worker_distribution
+    })
     
     # Performance assessment
-    if len(captcha_blocked) == num_requests:
+    if captcha_blocked == num_requests:
         print("✅ CAPTCHA protection working perfectly!")
-    if len(set(worker_pids)) > 1:
+    if len(worker_distribution) > 1:
         print("✅ Multi-worker load balancing working!")
     
     return results
 
-def test_info_endpoint_under_load():
+async def test_info_endpoint_under_load():
     """Test the info endpoint under heavy load"""
     print("\n🔥 Testing info endpoint under extreme load...")
     
-    start_time = time.time()
     num_requests = 100
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
-        futures = [
-            executor.submit(lambda i: requests.get("http://localhost:8000/api/info", timeout=10), i) 
-            for i in range(num_requests)
-        ]
-        results = []
-        for future in concurrent.futures.as_completed(futures):
-            try:
-                resp = future.result()
-                results.append({
-                    'status': resp.status_code,
-                    'worker_pid': resp.json().get('worker_pid') if resp.status_code == 200 else None
-                })
-            except Exception as e:
-                results.append({'status': 'error', 'error': str(e)})
-    
-    total_time = time.time() - start_time
-    
-    successful = [r for r in results if r['status'] == 200]
-    worker_pids = [r['worker_pid'] for r in successful if r.get('worker_pid')]
-    worker_distribution = Counter(worker_pids)
+    # Plain keep-alive sockets; the httpx request/response machinery is pure
+    # client overhead for a fixed local GET
+    async with RawHTTPClient() as client:
+        stats = await run_scenario("info_endpoint_under_load", get_info_raw, concurrency=20, total=num_requests, client=client)
+    p50, p95, p99 = stats.percentiles()
     
     print(f"📊 Extreme Load Test Results:")
     print(f"   Total requests: {num_requests}")
-    print(f"   Successful: {len(successful)}")
-    print(f"   Failed: {num_requests - len(successful)}")
-    print(f"   Total time: {total_time:.2f}s")
-    print(f"   Requests per second: {len(successful)/total_time:.1f}")
-    print(f"   Worker distribution: {dict(worker_distribution)}")
+    print(f"   Successful: {stats.successful}")
+    print(f"   Failed: {stats.failed} ({stats.backpressure} rejected by client backpressure)")
+    print(f"   Total time: {stats.elapsed:.2f}s")
+    print(f"   Requests per second: {stats.requests_per_second:.1f}")
+    print(f"   Latency p50/p95/p99: {p50:.3f}s / {p95:.3f}s / {p99:.3f}s")
+    print(f"   Worker distribution: {stats.worker_distribution}")
+    write_stats(stats.name, stats.summary())
 
 if __name__ == "__main__":
     print("🎯 Advanced Multi-Worker Performance Testing")
     print("=" * 50)
+    pin_load_generator()
+    warmup()
     
     # Test 1: Simulation endpoint (CAPTCHA protected)
     test_concurrent_simulations(10, 5)
     
     # Test 2: Extreme load on info endpoint
-    test_info_endpoint_under_load()
\ No newline at end of file
+    asyncio.run(test_info_endpoint_under_load())
\ No newline at end of file